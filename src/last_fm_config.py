@@ -1,8 +1,8 @@
 """Configuration file for Last FM analysis."""
+import functools
 import os
 
 from dotenv import load_dotenv
-import pycountry as pyc
 
 DATA_PATH = "data/"
 RESULTS_PATH = "results/"
@@ -13,17 +13,28 @@ file_name = "last_fm.env"
 load_dotenv(dotenv_path=dir_path + "/" + file_name)
 
 try:
-    LAST_FM_API_KEY = os.getenv("Key")
-    LAST_FM_API_SECRET = os.getenv("Secret")
-    LAST_FM_USERNAME = os.getenv("User")
+    LAST_FM_API_KEY = os.environ["Key"]
+    LAST_FM_USERNAME = os.environ["User"]
 except KeyError as e:
-    raise RuntimeError("No last_fm_api_key or secret in environment") from e
+    raise RuntimeError(
+        f"No {e.args[0]} in environment, set it in {file_name}"
+    ) from e
+
+LAST_FM_API_SECRET = os.getenv("Secret")
 
 USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36"
 
 LAST_FM_API_ROOT = "https://ws.audioscrobbler.com/2.0/"
 
-COUNTRIES = [x.name for x in list(pyc.countries)]
+
+@functools.lru_cache(maxsize=1)
+def get_countries():
+    """Get the ISO-3166 country names. pycountry is only imported when needed
+    as loading its database is slow."""
+    import pycountry as pyc
+
+    return [x.name for x in list(pyc.countries)]
+
 
 COUNTRY_NAME_CHANGES = {"Czechia": "Czech Republic"}
 
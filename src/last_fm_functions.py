@@ -1,83 +1,352 @@
 """Functions to help with the Last FM analysis."""
+import asyncio
+import functools
+import glob
+import os
+import re
+import threading
 import time
 
+import aiohttp
 import numpy as np
+import orjson
 import pandas as pd
-import requests
 import geopandas as gpd
 import matplotlib.pyplot as plt
 import seaborn as sns
 
+# Columns to extract from the records of each type of last.fm response, keyed
+# by the outer key of the response. Nested fields are separated by ".".
+_RESPONSE_COLUMNS = {
+    "topartists": [
+        "name",
+        "listeners",
+        "mbid",
+        "url",
+        "streamable",
+        "@attr.rank",
+    ],
+    "artists": [
+        "name",
+        "playcount",
+        "listeners",
+        "mbid",
+        "url",
+        "streamable",
+    ],
+    "recenttracks": [
+        "artist.mbid",
+        "artist.#text",
+        "streamable",
+        "mbid",
+        "album.mbid",
+        "album.#text",
+        "name",
+        "url",
+        "date.uts",
+        "date.#text",
+    ],
+}
+
+# Last.fm error codes for temporary failures that are worth retrying: service
+# offline, temporarily unavailable and rate limit exceeded.
+_RETRYABLE_LAST_FM_ERRORS = {11, 16, 29}
+
+
+def _get_nested(record, keys):
+    """Function to get a (possibly nested) field from a record, returning None
+    if it is missing."""
+
+    for key in keys:
+        if not isinstance(record, dict):
+            return None
+        record = record.get(key)
+
+    return record
+
+
+def _records_to_df(records, columns):
+    """Function to create a DataFrame with the chosen columns directly from the
+    records of a last.fm response."""
+
+    return pd.DataFrame(
+        {
+            col: [_get_nested(record, col.split(".")) for record in records]
+            for col in columns
+        },
+        columns=columns,
+    )
+
+
+def _create_last_fm_session(max_concurrent_requests):
+    """Function to create a client session that opens no more connections to
+    the last.fm api than the number of requests allowed in flight."""
+
+    connector = aiohttp.TCPConnector(limit_per_host=max_concurrent_requests)
+
+    return aiohttp.ClientSession(connector=connector)
+
+
+class _RateLimiter:
+    """Rate limiter to space out requests to the last.fm api. It is thread safe
+    so it can be shared between event loops running in different threads."""
+
+    def __init__(self, requests_per_second):
+        self._interval = 1 / requests_per_second
+        self._next_request_time = 0.0
+        self._lock = threading.Lock()
+
+    async def wait(self):
+        """Wait until the next request is allowed to be sent."""
+
+        # Reserve the next free slot, then sleep until it arrives.
+        with self._lock:
+            now = time.monotonic()
+            request_time = max(now, self._next_request_time)
+            self._next_request_time = request_time + self._interval
 
-def _send_last_fm_artist_request(
-    last_fm_api_url, request_headers, request_params, outer_col="topartists"
+        await asyncio.sleep(request_time - now)
+
+
+# Last.fm allows an average of 5 requests per second per api key, stay just
+# under this. A single rate limiter is shared by all requests so the limit
+# holds when several fetches run at once.
+_LAST_FM_RATE_LIMITER = _RateLimiter(requests_per_second=4)
+
+
+def _get_last_fm_error(content):
+    """Function to get the last.fm error code and message from the body of a
+    failed response, if it has one."""
+
+    try:
+        response = orjson.loads(content)
+    except orjson.JSONDecodeError:
+        return None, content[:200].decode(errors="replace")
+
+    if not isinstance(response, dict):
+        return None, str(response)[:200]
+
+    return response.get("error"), response.get("message")
+
+
+async def _send_last_fm_request_async(
+    session,
+    rate_limiter,
+    last_fm_api_url,
+    request_headers,
+    request_params,
+    ignored_errors=(),
+    max_retries=5,
 ):
-    """Function to send a request to the last.fm api for artist based methods."""
+    """Function to asynchronously send a request to the last.fm api and return
+    the parsed response. Rate limited and temporary server errors are retried
+    with exponential backoff, other failures raise a RuntimeError unless their
+    last.fm error code is in ignored_errors, in which case None is returned."""
+
+    for attempt in range(max_retries + 1):
+        # Adhere to rate limiting.
+        await rate_limiter.wait()
 
-    # Send request.
-    req = requests.get(
-        last_fm_api_url, headers=request_headers, params=request_params
+        # Send request.
+        async with session.get(
+            last_fm_api_url, headers=request_headers, params=request_params
+        ) as req:
+            status = req.status
+            content = await req.read()
+
+        if status == 200:
+            return orjson.loads(content)
+
+        # Retry temporary failures after backing off.
+        error, message = _get_last_fm_error(content)
+        retryable = (
+            status == 429
+            or status >= 500
+            or error in _RETRYABLE_LAST_FM_ERRORS
+        )
+        if retryable and attempt < max_retries:
+            await asyncio.sleep(2**attempt)
+            continue
+
+        if error in ignored_errors:
+            return None
+
+        # Leave the api key out of the error so it does not end up in logs.
+        logged_params = {
+            k: v for k, v in request_params.items() if k != "api_key"
+        }
+        raise RuntimeError(
+            f"last.fm request failed with status {status} (error {error}: "
+            f"{message}) for parameters {logged_params}"
+        )
+
+
+async def _send_last_fm_artist_request_async(
+    session,
+    rate_limiter,
+    last_fm_api_url,
+    request_headers,
+    request_params,
+    outer_col="topartists",
+    ignored_errors=(),
+):
+    """Function to asynchronously send a request to the last.fm api for artist
+    based methods."""
+
+    response = await _send_last_fm_request_async(
+        session,
+        rate_limiter,
+        last_fm_api_url,
+        request_headers=request_headers,
+        request_params=request_params,
+        ignored_errors=ignored_errors,
     )
 
-    # If the request was successful then parse the response, otherwise return
-    # an empty DataFrame.
-    if req.status_code == 200:
-        artists_df = pd.json_normalize(req.json()[outer_col]["artist"])
-    else:
-        artists_df = pd.DataFrame()
+    # If the request was ignored then return an empty DataFrame.
+    if response is None:
+        return pd.DataFrame()
 
-    return artists_df
+    return _records_to_df(
+        response[outer_col]["artist"], columns=_RESPONSE_COLUMNS[outer_col]
+    )
 
 
-def get_countries_top_artists(
+async def _get_countries_top_artists_async(
     countries,
     last_fm_api_url,
     request_headers,
     request_params,
     country_name_changes,
+    max_concurrent_requests,
 ):
-    """Function to loop through countries and send a request for the 50
-    artists with the most listeners for that country."""
-
-    # Loop through countries.
-    country_artists_df = pd.DataFrame()
-    for country in countries:
-        # Last Fm uses outdated name for Czechia, otherwise ISO-3166 is adhered
-        # to.
-        if country in country_name_changes:
-            country = country_name_changes[country]
-
-        print(f"Getting top 50 artists for {country}...")
-        request_params["country"] = country
-
-        # Send request and get response.
-        country_artist_df = _send_last_fm_artist_request(
-            last_fm_api_url,
-            request_headers=request_headers,
-            request_params=request_params,
+    """Function to concurrently send a request for the 50 artists with the most
+    listeners for each country."""
+
+    # Limit the number of requests in flight at any one time. The rate at
+    # which they are sent is limited across all fetches.
+    semaphore = asyncio.Semaphore(max_concurrent_requests)
+    rate_limiter = _LAST_FM_RATE_LIMITER
+
+    # Last Fm uses outdated name for Czechia, otherwise ISO-3166 is adhered
+    # to. Sort countries so the combined responses are ordered by country and
+    # then rank.
+    countries = sorted(country_name_changes.get(c, c) for c in countries)
+
+    async def fetch(session, country):
+        async with semaphore:
+            print(f"Getting top 50 artists for {country}...")
+
+            # Send request and get response. Last Fm does not recognise every
+            # ISO-3166 country name and responds with invalid parameters (error
+            # 6) for these, they are left without data.
+            country_artist_df = await _send_last_fm_artist_request_async(
+                session,
+                rate_limiter,
+                last_fm_api_url,
+                request_headers=request_headers,
+                request_params={**request_params, "country": country},
+                ignored_errors=(6,),
+            )
+
+        return country_artist_df
+
+    # Send requests for all countries.
+    async with _create_last_fm_session(max_concurrent_requests) as session:
+        country_artist_dfs = await asyncio.gather(
+            *[fetch(session, country) for country in countries]
         )
 
-        # If data was returned then add to accruing DataFrame.
-        if len(country_artist_df) > 0:
-            country_artist_df.drop(columns=["image"], inplace=True)
-            country_artist_df["country_rank"] = country_artist_df.index + 1
-            country_artist_df["country"] = country
+    # Combine the responses once, keyed by country. Countries for which no
+    # data was returned contribute no rows.
+    country_artists_df = pd.concat(
+        country_artist_dfs, keys=countries, names=["country", None]
+    )
+
+    # Add country information.
+    country_artists_df["country_rank"] = (
+        country_artists_df.groupby(level="country", sort=False).cumcount() + 1
+    )
+    country_artists_df["country"] = country_artists_df.index.get_level_values(
+        "country"
+    )
+
+    return country_artists_df.reset_index(drop=True)
 
-            country_artists_df = pd.concat(
-                [country_artists_df, country_artist_df], ignore_index=True
-            )
 
-        # Adhere to rate limiting.
-        time.sleep(1)
+def get_countries_top_artists(
+    countries,
+    last_fm_api_url,
+    request_headers,
+    request_params,
+    country_name_changes,
+    max_concurrent_requests=4,
+):
+    """Function to send a request for the 50 artists with the most listeners
+    for each country."""
 
-    # Format column data type.
+    country_artists_df = asyncio.run(
+        _get_countries_top_artists_async(
+            countries=countries,
+            last_fm_api_url=last_fm_api_url,
+            request_headers=request_headers,
+            request_params=request_params,
+            country_name_changes=country_name_changes,
+            max_concurrent_requests=max_concurrent_requests,
+        )
+    )
+
+    # Format column data types.
     country_artists_df["listeners"] = country_artists_df["listeners"].astype(
         float
     )
+    country_artists_df["country"] = country_artists_df["country"].astype(
+        "category"
+    )
 
     return country_artists_df
 
 
+@functools.lru_cache(maxsize=1)
+def _load_world_map(country_name_mappings):
+    """Function to load the natural earth low res map from geopandas. The
+    country name mappings are passed as a tuple of pairs so that the result can
+    be cached."""
+
+    # Load the natural earth low res map from geopandas. Rename country name
+    # column to facilitate merge. Correct deviations from ISO-3166.
+    country_name_mappings = dict(country_name_mappings)
+    world_map_path = gpd.datasets.get_path("naturalearth_lowres")
+    world_map = gpd.read_file(world_map_path)
+    world_map.rename(columns={"name": "country"}, inplace=True)
+    world_map["country"] = [
+        country_name_mappings.get(country, country)
+        for country in world_map["country"].to_numpy()
+    ]
+
+    return world_map
+
+
+def _add_top_artists_to_world_map(world_map, top_artists):
+    """Function to add the name and listeners of the top artist for each
+    country to the world map."""
+
+    # Index top artists by country, there should be one per country.
+    top_artists = top_artists.set_index("country")
+    if not top_artists.index.is_unique:
+        raise ValueError("Expected a single top artist for each country.")
+
+    # Only look up the top artist for countries in the world map that have
+    # one.
+    has_data = world_map["country"].isin(top_artists.index)
+    with_data = world_map.loc[has_data].copy()
+    with_data["name"] = with_data["country"].map(top_artists["name"])
+    with_data["listeners"] = with_data["country"].map(top_artists["listeners"])
+
+    # Add back countries without data so they are still drawn, their name and
+    # listeners are left missing.
+    return pd.concat([with_data, world_map.loc[~has_data]])
+
+
 def create_top_artists_world_map(
     country_artists_df, country_name_mappings, save_dir, save_name
 ):
@@ -86,16 +355,11 @@ def create_top_artists_world_map(
 
     fig, ax = plt.subplots()
 
-    # Load the natural earth low res map from geopandas. Rename country name
-    # column to facilitate merge. Correct deviations from ISO-3166.
-    world_map_path = gpd.datasets.get_path("naturalearth_lowres")
-    world_map = gpd.read_file(world_map_path)
-    world_map.rename(columns={"name": "country"}, inplace=True)
-    world_map["country"] = (
-        world_map["country"]
-        .map(country_name_mappings)
-        .fillna(world_map["country"])
-    )
+    # Load the natural earth low res map, copying so the cached map is not
+    # modified.
+    world_map = _load_world_map(
+        tuple(sorted(country_name_mappings.items()))
+    ).copy()
 
     # Select the top artist from each country.
     top_artists = country_artists_df.loc[
@@ -103,21 +367,16 @@ def create_top_artists_world_map(
     ]
 
     # Only explicitly show artist that are highest in 2 or more countries.
-    more_than_one_country = list(
-        top_artists["name"]
-        .value_counts()[top_artists["name"].value_counts().ge(2)]
-        .index
-    )
+    artist_counts = top_artists["name"].value_counts()
+    more_than_one_country = artist_counts.index[artist_counts.ge(2)].tolist()
 
     # Otherwise create an "Other" category.
     top_artists.loc[
         ~top_artists["name"].isin(more_than_one_country), "name"
     ] = "Other"
 
-    # Merge world map geometry with listeners.
-    world_map = world_map.merge(
-        top_artists[["country", "name", "listeners"]], how="left", on="country"
-    )
+    # Add top artist and listeners to world map geometry.
+    world_map = _add_top_artists_to_world_map(world_map, top_artists)
 
     # Create plot.
     world_map.plot(
@@ -154,26 +413,19 @@ def create_listener_fraction_world_map(
 
     fig, ax = plt.subplots()
 
-    # Load the natural earth low res map from geopandas. Rename country name
-    # column to facilitate merge. Correct deviations from ISO-3166.
-    world_map_path = gpd.datasets.get_path("naturalearth_lowres")
-    world_map = gpd.read_file(world_map_path)
-    world_map.rename(columns={"name": "country"}, inplace=True)
-    world_map["country"] = (
-        world_map["country"]
-        .map(country_name_mappings)
-        .fillna(world_map["country"])
-    )
+    # Load the natural earth low res map, copying so the cached map is not
+    # modified.
+    world_map = _load_world_map(
+        tuple(sorted(country_name_mappings.items()))
+    ).copy()
 
     # Select the top artist from each country.
     top_artists = country_artists_df.loc[
         country_artists_df["country_rank"].eq(1)
     ]
 
-    # Merge world map geometry with listeners.
-    world_map = world_map.merge(
-        top_artists[["country", "name", "listeners"]], how="left", on="country"
-    )
+    # Add top artist and listeners to world map geometry.
+    world_map = _add_top_artists_to_world_map(world_map, top_artists)
 
     world_map["listener_percentage"] = np.where(
         world_map["listeners"].lt(world_map["pop_est"]),
@@ -208,12 +460,65 @@ def create_listener_fraction_world_map(
     return fig, ax
 
 
+async def _get_top_artists_async(
+    last_fm_api_url,
+    request_headers,
+    request_params,
+    n_requests,
+    artists_per_page,
+    max_concurrent_requests,
+):
+    """Function to concurrently send the requests for each page of the top
+    artists."""
+
+    # Limit the number of requests in flight at any one time. The rate at
+    # which they are sent is limited across all fetches.
+    semaphore = asyncio.Semaphore(max_concurrent_requests)
+    rate_limiter = _LAST_FM_RATE_LIMITER
+
+    async def fetch(session, page):
+        async with semaphore:
+            # Send request.
+            top_artists = await _send_last_fm_artist_request_async(
+                session,
+                rate_limiter,
+                last_fm_api_url=last_fm_api_url,
+                request_headers=request_headers,
+                request_params={**request_params, "page": page},
+                outer_col="artists",
+            )
+
+        return top_artists
+
+    # Send requests for all pages.
+    async with _create_last_fm_session(max_concurrent_requests) as session:
+        top_artists_dfs = await asyncio.gather(
+            *[fetch(session, page) for page in range(1, n_requests + 1)]
+        )
+
+    # Combine the responses once, keyed by page. The rank is the position
+    # within the page offset by the artists on the preceding pages.
+    pages = range(1, n_requests + 1)
+    top_artists_df = pd.concat(
+        top_artists_dfs, keys=pages, names=["page", None]
+    )
+    page = top_artists_df.index.get_level_values("page").to_numpy()
+    top_artists_df["rank"] = (
+        top_artists_df.groupby(level="page", sort=False).cumcount()
+        + 1
+        + artists_per_page * (page - 1)
+    )
+
+    return top_artists_df.reset_index(drop=True)
+
+
 def get_top_artists(
     last_fm_api_url,
     request_headers,
     request_params,
     n_artists,
     artists_per_page,
+    max_concurrent_requests=4,
 ):
     """Function to retrieve the information for the top n artists."""
 
@@ -221,28 +526,16 @@ def get_top_artists(
     n_requests = int(np.ceil(n_artists / artists_per_page))
     request_params["limit"] = artists_per_page
 
-    # Loop over number of requests getting top artists.
-    top_artists_df = pd.DataFrame()
-    for page in range(1, n_requests + 1):
-        request_params["page"] = page
-
-        # Send request.
-        top_artists = _send_last_fm_artist_request(
+    top_artists_df = asyncio.run(
+        _get_top_artists_async(
             last_fm_api_url=last_fm_api_url,
             request_headers=request_headers,
             request_params=request_params,
-            outer_col="artists",
-        )
-        top_artists.drop(columns=["image"], inplace=True)
-        top_artists["rank"] = (top_artists.index + 1) + 200 * (page - 1)
-
-        # Add response to accruing DataFrame.
-        top_artists_df = pd.concat(
-            [top_artists_df, top_artists], ignore_index=True
+            n_requests=n_requests,
+            artists_per_page=artists_per_page,
+            max_concurrent_requests=max_concurrent_requests,
         )
-
-        # Handle rate limiting.
-        time.sleep(1)
+    )
 
     return top_artists_df
 
@@ -271,62 +564,263 @@ def plot_barplot(top_artists_df, x_col, y_col, save_dir, save_name):
     return fig, ax
 
 
-def _get_listening_history(last_fm_api_url, request_headers, request_params):
-    """Function to send a request to get (some of) my listening history."""
+async def _get_listening_history_async(
+    session, rate_limiter, last_fm_api_url, request_headers, request_params
+):
+    """Function to asynchronously send a request to get (some of) my listening
+    history."""
+
+    response = await _send_last_fm_request_async(
+        session,
+        rate_limiter,
+        last_fm_api_url,
+        request_headers=request_headers,
+        request_params=request_params,
+    )
 
-    # Send request.
-    req = requests.get(
-        last_fm_api_url, headers=request_headers, params=request_params
+    return _records_to_df(
+        response["recenttracks"]["track"],
+        columns=_RESPONSE_COLUMNS["recenttracks"],
     )
 
-    # If request successful then create DataFrame from response, otherwise return empty DataFrame.
-    if req.status_code == 200:
-        tracks_df = pd.json_normalize(req.json()["recenttracks"]["track"])
-    else:
-        tracks_df = pd.DataFrame()
+
+def _listening_history_page_path(page):
+    """Function to get the path a page of listening history is saved to."""
+
+    return f"data/my_tracks/page_{page:05d}.parquet"
+
+
+_LISTENING_HISTORY_METADATA_PATH = "data/my_tracks/metadata.json"
+
+
+def _write_atomically(path, write):
+    """Function to write a file via a temporary file that is then moved into
+    place, so an interrupted write never leaves a partial file at path."""
+
+    tmp_path = path + ".tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _load_listening_history_metadata(request_params):
+    """Function to load the metadata of the listening history saved by a
+    previous, unfinished, run. None is returned if there is none or it was
+    saved for a different user or page size."""
+
+    try:
+        with open(_LISTENING_HISTORY_METADATA_PATH, "rb") as f:
+            metadata = orjson.loads(f.read())
+    except FileNotFoundError:
+        return None
+
+    if (metadata["user"], metadata["limit"]) != (
+        request_params["user"],
+        request_params["limit"],
+    ):
+        return None
+
+    return metadata
+
+
+def _save_listening_history_metadata(metadata):
+    """Function to save the metadata of the listening history being
+    retrieved next to its pages."""
+
+    def write(path):
+        with open(path, "wb") as f:
+            f.write(orjson.dumps(metadata))
+
+    _write_atomically(_LISTENING_HISTORY_METADATA_PATH, write)
+
+
+async def _get_all_listening_history_async(
+    last_fm_api_url, request_headers, request_params, max_concurrent_requests
+):
+    """Function to determine the number of pages of listening history and then
+    concurrently send the requests for each page, saving each page to
+    parquet. Pages saved by a previous, unfinished, run are reused."""
+
+    # Last.fm returns the most recent tracks first, so new listens move tracks
+    # onto later pages. Only request tracks listened to before a cutoff, fixed
+    # when the history is first requested, so the pages stay the same if an
+    # unfinished run is resumed.
+    metadata = _load_listening_history_metadata(request_params)
+    resuming = metadata is not None
+    if not resuming:
+        # Remove pages saved for a different cutoff so none are read back in.
+        for path in glob.glob("data/my_tracks/page_*.parquet"):
+            os.remove(path)
+
+        metadata = {
+            "user": request_params["user"],
+            "limit": request_params["limit"],
+            "to": int(time.time()),
+        }
+        _save_listening_history_metadata(metadata)
+    request_params = {**request_params, "to": metadata["to"]}
+
+    # Limit the number of requests in flight at any one time. The rate at
+    # which they are sent is limited across all fetches.
+    semaphore = asyncio.Semaphore(max_concurrent_requests)
+    rate_limiter = _LAST_FM_RATE_LIMITER
+
+    async def fetch(session, page):
+        async with semaphore:
+            print(f"Getting tracks for page {page}")
+
+            # Send request.
+            tracks = await _get_listening_history_async(
+                session,
+                rate_limiter,
+                last_fm_api_url=last_fm_api_url,
+                request_headers=request_headers,
+                request_params={**request_params, "page": page},
+            )
+
+        # Save tracks, if any were returned.
+        if len(tracks) > 0:
+            _write_atomically(
+                _listening_history_page_path(page),
+                lambda path: tracks.to_parquet(
+                    path, engine="pyarrow", index=False
+                ),
+            )
+
+    async with _create_last_fm_session(max_concurrent_requests) as session:
+        # Send a test request for a single track in order to determine the
+        # total number of tracks, and so the number of pages. This avoids
+        # downloading and parsing a full page of tracks that are not used.
+        tst_response = await _send_last_fm_request_async(
+            session,
+            rate_limiter,
+            last_fm_api_url,
+            request_headers=request_headers,
+            request_params={**request_params, "limit": 1},
+        )
+        total_tracks = int(tst_response["recenttracks"]["@attr"]["total"])
+        total_pages = int(np.ceil(total_tracks / request_params["limit"]))
+
+        # Last.fm numbers pages from 1.
+        pages = range(1, total_pages + 1)
+
+        # Determine which pages have already been saved by the unfinished run
+        # being resumed.
+        saved_pages = {
+            int(re.match(r"page_(\d+)", os.path.basename(f)).group(1))
+            for f in glob.glob("data/my_tracks/page_*.parquet")
+        }
+
+        # Send requests for all pages not already saved.
+        await asyncio.gather(
+            *[
+                fetch(session, page)
+                for page in pages
+                if page not in saved_pages
+            ]
+        )
+
+    # Read the saved pages of this history back in one go, in page order.
+    # Other files in the directory, such as csv pages from older runs or pages
+    # beyond the current history, are not read.
+    page_paths = [
+        path
+        for path in map(_listening_history_page_path, pages)
+        if os.path.exists(path)
+    ]
+
+    tracks_df = pd.read_parquet(page_paths, engine="pyarrow")
+
+    # The history is complete, remove its metadata so a later run retrieves an
+    # up to date history rather than reusing these pages.
+    os.remove(_LISTENING_HISTORY_METADATA_PATH)
 
     return tracks_df
 
 
 def get_all_listening_history(
-    last_fm_api_url, request_headers, request_params, user, tracks_per_page
+    last_fm_api_url,
+    request_headers,
+    request_params,
+    user,
+    tracks_per_page,
+    max_concurrent_requests=4,
 ):
     """Determine the number of pages required to retrieve my complete listening
-    history then loop over each page sending request and receiving response."""
+    history then send a request for each page not already saved and combine
+    the saved pages."""
 
     # Set up request parameters.
     request_params["user"] = user
     request_params["limit"] = tracks_per_page
 
-    # Use these to send a test request in order to determine the number of pages.
-    tst = requests.get(
-        last_fm_api_url, headers=request_headers, params=request_params
-    )
-    total_pages = int(tst.json()["recenttracks"]["@attr"]["totalPages"])
-
-    # Loop over each page sending request and adding response to accruing
-    # DataFrame.
-    tracks_df = pd.DataFrame()
-    for page in range(total_pages):
-        print(f"Getting tracks for page {page}")
-        request_params["page"] = page
-
-        # Send request.
-        tracks = _get_listening_history(
+    tracks_df = asyncio.run(
+        _get_all_listening_history_async(
             last_fm_api_url=last_fm_api_url,
             request_headers=request_headers,
             request_params=request_params,
+            max_concurrent_requests=max_concurrent_requests,
         )
-        tracks.drop(columns=["image"], inplace=True)
+    )
 
-        # Save tracks and add to DataFrame.
-        tracks.to_csv(f"data/my_tracks/page_{page}.csv")
-        tracks_df = pd.concat([tracks_df, tracks], ignore_index=True)
+    return tracks_df
 
-        # Handle rate limiting.
-        time.sleep(2)
 
-    return tracks_df
+def _rolling_365d_count(ts_ns):
+    """Function to count, for each of a sorted array of nanosecond timestamps,
+    the number of timestamps in the 365 days up to and including it."""
+
+    window_ns = 365 * 86400 * 10**9
+    counts = np.empty(len(ts_ns), dtype=np.int64)
+
+    # Walk the timestamps, moving the start of the window forward until it is
+    # within 365 days of the current timestamp.
+    lo = 0
+    for hi in range(len(ts_ns)):
+        while ts_ns[hi] - ts_ns[lo] >= window_ns:
+            lo += 1
+        counts[hi] = hi - lo + 1
+
+    return counts
+
+
+@functools.lru_cache(maxsize=1)
+def _get_rolling_365d_count():
+    """Function to compile the rolling count with numba on first use. numba is
+    only imported when needed as it is slow to import."""
+    from numba import njit
+
+    return njit(cache=True)(_rolling_365d_count)
+
+
+def rolling_365d_listens(tracks_df, artists):
+    """Function to create the rolling count of listens over the previous 365
+    days for each of the chosen artists."""
+
+    rolling_365d_count = _get_rolling_365d_count()
+
+    rolling_listening = []
+    for artist in artists:
+        # Select the artist's listens in time order.
+        artist_datetimes = (
+            tracks_df.loc[tracks_df["artist"].eq(artist), "datetime"]
+            .dropna()
+            .sort_values()
+            .to_numpy(dtype="datetime64[ns]")
+        )
+
+        # Count listens in the previous 365 days at each listen.
+        counts = rolling_365d_count(artist_datetimes.view("int64"))
+        rolling_listening.append(
+            pd.DataFrame(
+                {
+                    "artist": artist,
+                    "datetime": artist_datetimes,
+                    "name": counts,
+                }
+            )
+        )
+
+    return pd.concat(rolling_listening, ignore_index=True)
 
 
 def longitudinal_plot(rolling_listening, order, save_dir, save_name):
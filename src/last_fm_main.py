@@ -1,4 +1,8 @@
 """Main script for Last FM analysis."""
+import calendar
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import pandas as pd
 from matplotlib import rcParams
 
@@ -16,6 +20,13 @@ rcParams["ytick.labelsize"] = 14
 rcParams["legend.fontsize"] = 12
 rcParams["legend.title_fontsize"] = 16
 
+# Plots are only saved to file, use a non-interactive backend so figures can be
+# created outside the main thread.
+rcParams["backend"] = "Agg"
+
+# Matplotlib is not thread safe so only one analysis may plot at a time.
+PLOT_LOCK = threading.Lock()
+
 
 def geographic_top_artists():
     """Retrieve the artists with most last.fm listeners for each country and
@@ -28,7 +39,7 @@ def geographic_top_artists():
         )
     except FileNotFoundError:
         country_artists_df = lf.get_countries_top_artists(
-            countries=cfg.COUNTRIES,
+            countries=cfg.get_countries(),
             last_fm_api_url=cfg.LAST_FM_API_ROOT,
             request_headers={"user-agent": cfg.USER_AGENT},
             request_params={
@@ -38,28 +49,27 @@ def geographic_top_artists():
             },
             country_name_changes=cfg.COUNTRY_NAME_CHANGES,
         )
-        country_artists_df.sort_values(
-            by=["country", "country_rank"], inplace=True
-        )
         country_artists_df.to_csv(
             cfg.DATA_PATH + "country_artists_df.csv", index=False
         )
 
     # Create a world map showing top artist for each country.
-    _, _ = lf.create_top_artists_world_map(
-        country_artists_df,
-        country_name_mappings=cfg.COUNTRY_NAME_MAPPING,
-        save_dir=cfg.RESULTS_PATH,
-        save_name="top_artist_world_map.png",
-    )
+    with PLOT_LOCK:
+        _, _ = lf.create_top_artists_world_map(
+            country_artists_df,
+            country_name_mappings=cfg.COUNTRY_NAME_MAPPING,
+            save_dir=cfg.RESULTS_PATH,
+            save_name="top_artist_world_map.png",
+        )
 
     # Create listener fraction world map.
-    _, _ = lf.create_listener_fraction_world_map(
-        country_artists_df,
-        country_name_mappings=cfg.COUNTRY_NAME_MAPPING,
-        save_dir=cfg.RESULTS_PATH,
-        save_name="listener_frac_world_map.png",
-    )
+    with PLOT_LOCK:
+        _, _ = lf.create_listener_fraction_world_map(
+            country_artists_df,
+            country_name_mappings=cfg.COUNTRY_NAME_MAPPING,
+            save_dir=cfg.RESULTS_PATH,
+            save_name="listener_frac_world_map.png",
+        )
 
 
 def overall_top_artists():
@@ -84,21 +94,26 @@ def overall_top_artists():
         top_artists_df.to_csv(cfg.DATA_PATH + "top_artists_df.csv")
 
     # Format columns and create average plays per listener column.
-    top_artists_df["playcount"] = top_artists_df["playcount"].astype(float)
-    top_artists_df["listeners"] = top_artists_df["listeners"].astype(float)
+    top_artists_df["playcount"] = pd.to_numeric(
+        top_artists_df["playcount"], downcast="unsigned"
+    )
+    top_artists_df["listeners"] = pd.to_numeric(
+        top_artists_df["listeners"], downcast="unsigned"
+    )
     top_artists_df["plays_per_listener"] = (
         top_artists_df["playcount"] / top_artists_df["listeners"]
     )
 
     # Create basic summary plots.
     for stat in ["listeners", "playcount", "plays_per_listener"]:
-        lf.plot_barplot(
-            top_artists_df=top_artists_df,
-            x_col=stat,
-            y_col="name",
-            save_dir=cfg.RESULTS_PATH,
-            save_name=f"{stat}.png",
-        )
+        with PLOT_LOCK:
+            lf.plot_barplot(
+                top_artists_df=top_artists_df,
+                x_col=stat,
+                y_col="name",
+                save_dir=cfg.RESULTS_PATH,
+                save_name=f"{stat}.png",
+            )
 
 
 def my_listening_history():
@@ -133,64 +148,78 @@ def my_listening_history():
         },
         inplace=True,
     )
+    tracks_df["artist"] = tracks_df["artist"].astype("category")
+    tracks_df["album"] = tracks_df["album"].astype("category")
 
     # Determine top 6 most listened artists. Create rolling listening count of
     # last 365 days for these 6 artists.
-    top_6_artists = list(tracks_df["artist"].value_counts().head(6).index)
-    rolling_listening = (
-        tracks_df.loc[tracks_df["artist"].isin(top_6_artists)]
-        .set_index("datetime")
-        .groupby("artist")
-        .rolling("365d", min_periods=1)["name"]
-        .count()
-        .reset_index()
-    )
+    artist_listens = tracks_df.groupby(
+        "artist", sort=False, observed=True
+    ).size()
+    top_6_artists = artist_listens.nlargest(6).index.tolist()
+    rolling_listening = lf.rolling_365d_listens(tracks_df, top_6_artists)
 
     # Plot rolling listening count.
-    _, _ = lf.longitudinal_plot(
-        rolling_listening,
-        order=top_6_artists,
-        save_dir=cfg.RESULTS_PATH,
-        save_name="rolling_listening.png",
-    )
+    with PLOT_LOCK:
+        _, _ = lf.longitudinal_plot(
+            rolling_listening,
+            order=top_6_artists,
+            save_dir=cfg.RESULTS_PATH,
+            save_name="rolling_listening.png",
+        )
 
-    # Create hour and year columns.
-    tracks_df["hour"] = tracks_df["datetime"].dt.hour
-    tracks_df["year"] = tracks_df["datetime"].dt.year
+    # Create hour and year columns directly from the underlying timestamps.
+    datetimes = tracks_df["datetime"].to_numpy(dtype="datetime64[ns]")
+    tracks_df["year"] = datetimes.astype("datetime64[Y]").astype(int) + 1970
+    tracks_df["hour"] = (
+        datetimes.astype("datetime64[h]").astype("int64") % 24
+    ).astype("int8")
 
     # Create count of plays by hour and year.
-    hour_year_counts = pd.pivot_table(
-        data=tracks_df,
-        index="year",
-        columns="hour",
-        values="name",
-        aggfunc="count",
+    hour_year_counts = (
+        tracks_df.groupby(["year", "hour"])
+        .size()
+        .unstack("hour", fill_value=0)
     )
 
     # Focus only on complete listening years.
-    hour_year_counts = hour_year_counts.loc[list(range(2015, 2023, 1)), :]
+    complete_years = range(2015, 2023, 1)
+    days_in_year = pd.Series(
+        [366 if calendar.isleap(year) else 365 for year in complete_years],
+        index=complete_years,
+    )
 
     # Calculate daily average.
-    hour_year_counts = (
-        hour_year_counts.T / ([365, 366, 365, 365, 365, 366, 365, 365])
-    ).T
+    hour_year_counts = hour_year_counts.loc[days_in_year.index].div(
+        days_in_year, axis=0
+    )
 
     # Produce heatmap showing information
-    _, _ = lf.listening_timing_heatmap(
-        listen_hour_counts=hour_year_counts,
-        save_dir=cfg.RESULTS_PATH,
-        save_name="year_hour_counts.png",
-    )
+    with PLOT_LOCK:
+        _, _ = lf.listening_timing_heatmap(
+            listen_hour_counts=hour_year_counts,
+            save_dir=cfg.RESULTS_PATH,
+            save_name="year_hour_counts.png",
+        )
 
 
 def main():
     """Main function for analysis."""
 
-    geographic_top_artists()
-
-    overall_top_artists()
-
-    my_listening_history()
+    # The analyses are independent and mostly spent waiting on the last.fm
+    # api, so run them concurrently. Their requests share a single rate limit
+    # so running them together does not exceed the api's limit.
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        list(
+            executor.map(
+                lambda analysis: analysis(),
+                [
+                    geographic_top_artists,
+                    overall_top_artists,
+                    my_listening_history,
+                ],
+            )
+        )
 
 
 if __name__ == "__main__":